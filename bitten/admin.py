@@ -18,11 +18,14 @@ from trac.web.chrome import add_stylesheet, add_script, add_warning, add_notice
 from trac.versioncontrol.api import RepositoryManager
 
 from bitten import __multirepos__
+from bitten.master import BuildMaster
 from bitten.model import BuildConfig, TargetPlatform
 from bitten.recipe import Recipe, InvalidRecipeError
 from bitten.util import xmlio
 from bitten.util.repository import get_repos
 
+_NAME_RE = re.compile(r'^[\w.-]+\Z')
+
 
 class BuildMasterAdminPageProvider(Component):
     """Web administration panel for configuring the build master."""
@@ -36,7 +39,6 @@ class BuildMasterAdminPageProvider(Component):
             yield ('bitten', 'Builds', 'master', 'Master Settings')
 
     def render_admin_panel(self, req, cat, page, path_info):
-        from bitten.master import BuildMaster
         master = BuildMaster(self.env)
 
         if req.method == 'POST':
@@ -51,38 +53,40 @@ class BuildMasterAdminPageProvider(Component):
 
     def _save_config_changes(self, req, master):
         changed = False
+        args = req.args
+        section = self.config['bitten']
 
-        build_all = 'build_all' in req.args
+        build_all = 'build_all' in args
         if build_all != master.build_all:
-            self.config['bitten'].set('build_all',
-                                      build_all and 'yes' or 'no')
+            section.set('build_all', build_all and 'yes' or 'no')
             changed = True
 
-        adjust_timestamps = 'adjust_timestamps' in req.args
+        adjust_timestamps = 'adjust_timestamps' in args
         if adjust_timestamps != master.adjust_timestamps:
-            self.config['bitten'].set('adjust_timestamps',
-                                      adjust_timestamps and 'yes' or 'no')
+            section.set('adjust_timestamps',
+                        adjust_timestamps and 'yes' or 'no')
             changed = True
 
-        stabilize_wait = int(req.args.get('stabilize_wait', 0))
+        stabilize_wait = int(args.get('stabilize_wait', 0))
         if stabilize_wait != master.stabilize_wait:
-            self.config['bitten'].set('stabilize_wait', str(stabilize_wait))
+            section.set('stabilize_wait', str(stabilize_wait))
             changed = True
 
-        slave_timeout = int(req.args.get('slave_timeout', 0))
+        slave_timeout = int(args.get('slave_timeout', 0))
         if slave_timeout != master.slave_timeout:
-            self.config['bitten'].set('slave_timeout', str(slave_timeout))
+            section.set('slave_timeout', str(slave_timeout))
             changed = True
 
-        quick_status = 'quick_status' in req.args
+        quick_status = 'quick_status' in args
         if quick_status != master.quick_status:
-            self.config['bitten'].set('quick_status',
-                                      quick_status and 'yes' or 'no')
+            section.set('quick_status', quick_status and 'yes' or 'no')
             changed = True
 
-        logs_dir = req.args.get('logs_dir', None)
-        if logs_dir != master.logs_dir:
-            self.config['bitten'].set('logs_dir', str(logs_dir))
+        # Leave the logs directory alone if the field wasn't submitted,
+        # rather than storing the string 'None'
+        logs_dir = args.get('logs_dir')
+        if logs_dir is not None and logs_dir != master.logs_dir:
+            section.set('logs_dir', logs_dir)
             changed = True
 
         if changed:
@@ -149,7 +153,7 @@ class BuildConfigurationsAdminPageProvider(Component):
 
                 if req.method == 'POST':
                     if 'remove' in req.args: # Remove selected platforms
-                        self._remove_platforms(req)
+                        self._remove_platforms(req, platforms)
                         add_notice(req, "Target Platform(s) Removed.")
                         req.redirect(req.abs_href.admin(cat, page, config.name))
 
@@ -206,16 +210,15 @@ class BuildConfigurationsAdminPageProvider(Component):
                 req.redirect(req.abs_href.admin(cat, page))
 
             # Prepare template variables
-            configs = []
-            for config in BuildConfig.select(self.env, include_inactive=True):
-                configs.append({
+            data['configs'] = sorted(({
                     'name': config.name, 'label': config.label or config.name,
                     'active': config.active, 'path': config.path,
                     'min_rev': config.min_rev, 'max_rev': config.max_rev,
                     'href': req.href.admin('bitten', 'configs', config.name),
                     'recipe': config.recipe and True or False
-                })
-            data['configs'] = sorted(configs, key=lambda x:x['label'].lower())
+                } for config in BuildConfig.select(self.env,
+                                                   include_inactive=True)),
+                key=lambda x:x['label'].lower())
 
         add_stylesheet(req, 'bitten/admin.css')
         add_script(req, 'common/js/suggest.js')
@@ -227,13 +230,19 @@ class BuildConfigurationsAdminPageProvider(Component):
         req.perm.assert_permission('BUILD_MODIFY')
 
         active = req.args.get('active') or []
-        active = isinstance(active, list) and active or [active]
+        active = list(set(isinstance(active, list) and active or [active]))
 
-        for config in list(BuildConfig.select(self.env,
-                                              include_inactive=True)):
-            config.active = config.name in active
-            config.update()
-        db.commit()
+        with self.env.db_transaction as db:
+            cursor = db.cursor()
+            if active:
+                names = ",".join(["%s"] * len(active))
+                cursor.execute("UPDATE bitten_config SET active=1 "
+                               "WHERE name IN (" + names + ")", active)
+                cursor.execute("UPDATE bitten_config SET active=0 "
+                               "WHERE name NOT IN (" + names + ")", active)
+            else:
+                cursor.execute("UPDATE bitten_config SET active=0")
+        #commit
 
     def _create_config(self, req):
         req.perm.assert_permission('BUILD_CREATE')
@@ -256,9 +265,11 @@ class BuildConfigurationsAdminPageProvider(Component):
             raise TracError('No configuration selected')
         sel = isinstance(sel, list) and sel or [sel]
 
+        configs = dict((config.name, config) for config
+                       in BuildConfig.select(self.env, include_inactive=True))
         with self.env.db_transaction as db:
             for name in sel:
-                config = BuildConfig.fetch(self.env, name)
+                config = configs.get(name)
                 if not config:
                     raise TracError('Configuration %r not found' % name)
                 config.delete()
@@ -271,7 +282,7 @@ class BuildConfigurationsAdminPageProvider(Component):
         name = req.args.get('name')
         if not name:
             warnings.append('Missing required field "name".')
-        if name and not re.match(r'^[\w.-]+$', name):
+        if name and not _NAME_RE.match(name):
             warnings.append('The field "name" may only contain letters, '
                             'digits, periods, or dashes.')
 
@@ -293,7 +304,8 @@ class BuildConfigurationsAdminPageProvider(Component):
                 warnings.append('Invalid Oldest Revision: %s.' % unicode(e))
 
         recipe_xml = req.args.get('recipe', '')
-        if recipe_xml:
+        # An unchanged recipe has already been validated when it was saved
+        if recipe_xml and recipe_xml != config.recipe:
             try:
                 Recipe(xmlio.parse(recipe_xml)).validate()
             except xmlio.ParseError, e:
@@ -329,7 +341,7 @@ class BuildConfigurationsAdminPageProvider(Component):
         platform.insert()
         return platform
 
-    def _remove_platforms(self, req):
+    def _remove_platforms(self, req, platforms):
         req.perm.assert_permission('BUILD_MODIFY')
 
         sel = req.args.get('sel')
@@ -337,9 +349,10 @@ class BuildConfigurationsAdminPageProvider(Component):
             raise TracError('No platform selected')
         sel = isinstance(sel, list) and sel or [sel]
 
+        platforms = dict((str(platform.id), platform) for platform in platforms)
         with self.env.db_transaction as db:
             for platform_id in sel:
-                platform = TargetPlatform.fetch(self.env, platform_id)
+                platform = platforms.get(platform_id)
                 if not platform:
                     raise TracError('Target platform %r not found' % platform_id)
                 platform.delete()
@@ -348,11 +361,17 @@ class BuildConfigurationsAdminPageProvider(Component):
     def _update_platform(self, req, platform):
         platform.name = req.args.get('name')
 
-        properties = [int(key[9:]) for key in req.args.keys()
-                      if key.startswith('property_')]
+        properties, patterns, add_rules, rm_rules = [], [], [], []
+        for key in req.args:
+            if key.startswith('property_'):
+                properties.append(int(key[9:]))
+            elif key.startswith('pattern_'):
+                patterns.append(int(key[8:]))
+            elif key.startswith('add_rule_'):
+                add_rules.append(int(key[9:]))
+            elif key.startswith('rm_rule_'):
+                rm_rules.append(int(key[8:]))
         properties.sort()
-        patterns = [int(key[8:]) for key in req.args.keys()
-                    if key.startswith('pattern_')]
         patterns.sort()
         platform.rules = [(req.args.get('property_%d' % property).strip(),
                            req.args.get('pattern_%d' % pattern).strip())
@@ -364,13 +383,9 @@ class BuildConfigurationsAdminPageProvider(Component):
         else:
             platform.insert()
 
-        add_rules = [int(key[9:]) for key in req.args.keys()
-                     if key.startswith('add_rule_')]
         if add_rules:
             platform.rules.insert(add_rules[0] + 1, ('', ''))
             return False
-        rm_rules = [int(key[8:]) for key in req.args.keys()
-                    if key.startswith('rm_rule_')]
         if rm_rules:
             if rm_rules[0] < len(platform.rules):
                 del platform.rules[rm_rules[0]]
@@ -13,6 +13,8 @@
 import logging
 import fnmatch
 import os
+import posixpath
+import re
 import shlex
 import time
 import subprocess
@@ -159,6 +161,15 @@ class CommandLine(object):
                   self.returncode)
 
 
+def _compile_patterns(patterns):
+    """Combine a list of shell-style patterns into a single compiled regular
+    expression that matches a name if any of the patterns does (using the
+    case-sensitive semantics of `fnmatch.fnmatchcase`).
+    """
+    return re.compile('|'.join(['(?:%s)' % fnmatch.translate(pattern)
+                                for pattern in patterns]))
+
+
 class FileSet(object):
     """Utility class for collecting a list of files in a directory that match
     given name/path patterns."""
@@ -186,31 +197,37 @@ class FileSet(object):
         if exclude is not None:
             self.exclude += shlex.split(exclude)
 
+        # Match all include and all exclude patterns with one regular
+        # expression each, instead of trying the patterns one by one
+        include = self.include and _compile_patterns(self.include).match
+        exclude = _compile_patterns(self.exclude).match
+
+        # An exclude pattern of the form "dir/*" excludes everything below
+        # the directories it matches, so those directories are not walked
+        exclude_dirs = [pattern[:-2] for pattern in self.exclude
+                        if pattern.endswith('/*')]
+        exclude_dir = exclude_dirs and _compile_patterns(exclude_dirs).match
+
         for dirpath, dirnames, filenames in os.walk(self.basedir):
             dirpath = dirpath[len(self.basedir) + 1:]
 
+            if exclude_dir:
+                ndirpath = dirpath
+                if os.sep != '/':
+                    ndirpath = ndirpath.replace(os.sep, '/')
+                dirnames[:] = [dirname for dirname in dirnames
+                               if not exclude_dir(posixpath.join(ndirpath,
+                                                                 dirname))]
+
             for filename in filenames:
                 filepath = nfilepath = os.path.join(dirpath, filename)
                 if os.sep != '/':
                     nfilepath = nfilepath.replace(os.sep, '/')
 
-                if self.include:
-                    included = False
-                    for pattern in self.include:
-                        if fnmatch.fnmatchcase(nfilepath, pattern) or \
-                           fnmatch.fnmatchcase(filename, pattern):
-                            included = True
-                            break
-                    if not included:
-                        continue
-
-                excluded = False
-                for pattern in self.exclude:
-                    if fnmatch.fnmatchcase(nfilepath, pattern) or \
-                       fnmatch.fnmatchcase(filename, pattern):
-                        excluded = True
-                        break
-                if not excluded:
+                if include and not (include(nfilepath) or include(filename)):
+                    continue
+
+                if not (exclude(nfilepath) or exclude(filename)):
                     self.files.append(filepath)
 
     def __iter__(self):
@@ -181,6 +181,10 @@ class Configuration(object):
         :param text: the string containing variable references
         :param vars: extra variables to use for the interpolation
         """
+        if '$' not in text:
+            # Nothing to interpolate
+            return text
+
         def _replace(m):
             refname = m.group('ref')
             if refname in self:
@@ -191,5 +195,6 @@ class Configuration(object):
                 return m.group('def')
             else:
                 return m.group(0)
-        return Template(self._VAR_RE.sub(_replace, text)
-                                                ).safe_substitute(os.environ)
+        if '${' in text:
+            text = self._VAR_RE.sub(_replace, text)
+        return Template(text).safe_substitute(os.environ)
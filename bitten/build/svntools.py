@@ -10,6 +10,7 @@
 
 """Recipe commands for Subversion."""
 
+import errno
 import logging
 import posixpath
 import re
@@ -37,8 +38,12 @@ def copytree(src, dst, symlinks=False):
 
     """
     names = os.listdir(src)
-    if not os.path.isdir(dst):
+    # Only stat the destination if it could not be created
+    try:
         os.makedirs(dst)
+    except OSError, e:
+        if e.errno != errno.EEXIST or not os.path.isdir(dst):
+            raise
     errors = []
     for name in names:
         srcname = os.path.join(src, name)
@@ -207,6 +207,27 @@ class FileSetTestCase(unittest.TestCase):
         fileset = FileSet(self.basedir, include='tests/*.txt', exclude='bar.*')
         assert foo_txt in fileset and bar_txt not in fileset
 
+    def test_files_with_multiple_patterns(self):
+        self._create_dir('tests')
+        foo_txt = self._create_file('tests', 'foo.txt')
+        bar_txt = self._create_file('tests', 'bar.txt')
+        baz_py = self._create_file('baz.py')
+        qux_c = self._create_file('qux.c')
+        fileset = FileSet(self.basedir, include='tests/*.txt *.py',
+                          exclude='bar.* *.c')
+        self.assertEqual(sorted([foo_txt, baz_py]), sorted(fileset))
+
+    def test_files_in_excluded_dirs(self):
+        self._create_dir('.svn')
+        self._create_file('.svn', 'entries')
+        self._create_dir('tests', '.svn')
+        self._create_file('tests', '.svn', 'entries')
+        foo_txt = self._create_file('tests', 'foo.txt')
+        self._create_dir('build')
+        self._create_file('build', 'bar.txt')
+        fileset = FileSet(self.basedir, exclude='build/*')
+        self.assertEqual([foo_txt], list(fileset))
+
 
 def suite():
     suite = unittest.TestSuite()
@@ -169,6 +169,13 @@ name = invalid option
         self.assertEqual('foo /usr/local/bin/python2.3 bar',
                          config.interpolate('foo ${python.path} bar'))
 
+    def test_interpolate_no_references(self):
+        config = Configuration(properties={
+            'python.path': '/usr/local/bin/python2.3'
+        })
+        self.assertEqual('python.path', config.interpolate('python.path'))
+        self.assertEqual('', config.interpolate(''))
+
     def test_interpolate_default(self):
         config = Configuration()
         self.assertEqual('python2.3',
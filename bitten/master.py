@@ -274,9 +274,10 @@ class BuildMaster(Component):
         self.log.info('Build slave %r initiated build %d', build.slave,
                       build.id)
 
-        # create the first step, mark it as in-progress.
+        # create the first step, mark it as in-progress. The recipe document
+        # parsed above is reused rather than parsing the recipe again.
 
-        recipe = Recipe(xmlio.parse(config.recipe))
+        recipe = Recipe(xml)
         stepname = recipe.__iter__().next().id
 
         step = self._start_new_step(build, stepname)
@@ -304,25 +304,58 @@ class TargetPlatform(object):
 
     fetch = classmethod(fetch)
 
-    def select(cls, env, config=None):
+    def select(cls, env, config=None, configs=None):
         """Retrieve existing target platforms from the database that match the
         specified criteria.
+
+        :param configs: a sequence of build configuration names the platforms
+                        should be restricted to (optional)
         """
 
         where_clauses = []
         if config is not None:
             where_clauses.append(("config=%s", config))
+        if configs is not None:
+            if not configs:
+                return
+            where_clauses.append(("config IN (%s)" %
+                                  ",".join(["%s"] * len(configs)),
+                                  list(configs)))
         if where_clauses:
             where = "WHERE " + " AND ".join([wc[0] for wc in where_clauses])
         else:
             where = ""
+        args = []
+        for wc in where_clauses:
+            if isinstance(wc[1], list):
+                args.extend(wc[1])
+            else:
+                args.append(wc[1])
 
         with env.db_query as db:
             cursor = db.cursor()
-            cursor.execute("SELECT id FROM bitten_platform %s ORDER BY name"
-                           % where, [wc[1] for wc in where_clauses])
-            for (id,) in cursor:
-                yield TargetPlatform.fetch(env, id)
+            cursor.execute("SELECT id,config,name FROM bitten_platform %s "
+                           "ORDER BY name" % where, args)
+            platforms = []
+            for row in cursor.fetchall():
+                platform = TargetPlatform(env, config=row[1], name=row[2])
+                platform.id = int(row[0])
+                platforms.append(platform)
+            if not platforms:
+                return
+
+            # Fetch the rules of all selected platforms with one query rather
+            # than with a query per platform
+            platforms_by_id = dict([(platform.id, platform)
+                                    for platform in platforms])
+            cursor.execute("SELECT id,propname,pattern FROM bitten_rule "
+                           "WHERE id IN (SELECT id FROM bitten_platform %s) "
+                           "ORDER BY id,orderno" % where, args)
+            for id, propname, pattern in cursor:
+                platforms_by_id[int(id)].rules.append((propname, pattern))
+
+        for platform in platforms:
+            yield platform
 
     select = classmethod(select)
 
@@ -487,9 +520,12 @@ class Build(object):
     fetch = classmethod(fetch)
 
     def select(cls, env, config=None, rev=None, platform=None, slave=None,
-               status=None, min_rev_time=None, max_rev_time=None):
+               status=None, min_rev_time=None, max_rev_time=None, revs=None):
         """Retrieve existing builds from the database that match the specified
         criteria.
+
+        :param revs: a sequence of revisions the builds should be restricted
+                     to (optional)
         """
 
         where_clauses = []
@@ -497,6 +533,11 @@ class Build(object):
             where_clauses.append(("config=%s", config))
         if rev is not None:
             where_clauses.append(("rev=%s", str(rev)))
+        if revs is not None:
+            if not revs:
+                return
+            where_clauses.append(("rev IN (%s)" % ",".join(["%s"] * len(revs)),
+                                  [str(r) for r in revs]))
         if platform is not None:
             where_clauses.append(("platform=%s", platform))
         if slave is not None:
@@ -511,17 +552,74 @@ class Build(object):
             where = "WHERE " + " AND ".join([wc[0] for wc in where_clauses])
         else:
             where = ""
+        args = []
+        for wc in where_clauses:
+            if isinstance(wc[1], list):
+                args.extend(wc[1])
+            else:
+                args.append(wc[1])
 
         with env.db_query as db:
             cursor = db.cursor()
-            cursor.execute("SELECT id FROM bitten_build %s "
+            slave_cursor = db.cursor()
+            cursor.execute("SELECT id,config,rev,rev_time,platform,slave,"
+                           "started,stopped,last_activity,status "
+                           "FROM bitten_build %s "
                            "ORDER BY rev_time DESC,config,slave"
-                           % where, [wc[1] for wc in where_clauses])
-            for (id,) in cursor:
-                yield Build.fetch(env, id)
+                           % where, args)
+            while True:
+                rows = cursor.fetchmany(100)
+                if not rows:
+                    break
+                # Fetch the slave properties of each batch of builds with one
+                # query rather than with a query per build
+                ids = [int(row[0]) for row in rows]
+                slave_cursor.execute("SELECT build,propname,propvalue "
+                                     "FROM bitten_slave WHERE build IN (%s)"
+                                     % ",".join(["%s"] * len(ids)), ids)
+                slave_info = {}
+                for id, propname, propvalue in slave_cursor:
+                    slave_info.setdefault(int(id), {})[propname] = propvalue
+
+                for row in rows:
+                    build = Build(env, config=row[1], rev=row[2],
+                                  rev_time=int(row[3]), platform=int(row[4]),
+                                  slave=row[5],
+                                  started=row[6] and int(row[6]) or 0,
+                                  stopped=row[7] and int(row[7]) or 0,
+                                  last_activity=row[8] and int(row[8]) or 0,
+                                  status=row[9])
+                    build.id = int(row[0])
+                    build.slave_info.update(slave_info.get(build.id, {}))
+                    yield build
 
     select = classmethod(select)
 
+    def count(cls, env, config=None, platform=None, min_rev_time=None):
+        """Return the number of existing builds in the database that match the
+        specified criteria.
+        """
+
+        where_clauses = []
+        if config is not None:
+            where_clauses.append(("config=%s", config))
+        if platform is not None:
+            where_clauses.append(("platform=%s", platform))
+        if min_rev_time is not None:
+            where_clauses.append(("rev_time>=%s", min_rev_time))
+        if where_clauses:
+            where = "WHERE " + " AND ".join([wc[0] for wc in where_clauses])
+        else:
+            where = ""
+
+        with env.db_query as db:
+            cursor = db.cursor()
+            cursor.execute("SELECT COUNT(*) FROM bitten_build %s" % where,
+                           [wc[1] for wc in where_clauses])
+            return cursor.fetchone()[0]
+
+    count = classmethod(count)
+
 
 class BuildStep(object):
     """Represents an individual step of an executed build."""
@@ -631,15 +729,23 @@ class BuildStep(object):
 
     fetch = classmethod(fetch)
 
-    def select(cls, env, build=None, name=None, status=None):
+    def select(cls, env, build=None, name=None, status=None, builds=None):
         """Retrieve existing build steps from the database that match the
         specified criteria.
+
+        :param builds: a sequence of build IDs the steps should be restricted
+                       to (optional)
         """
         assert status in (None, BuildStep.SUCCESS, BuildStep.IN_PROGRESS, BuildStep.FAILURE)
 
         where_clauses = []
         if build is not None:
             where_clauses.append(("build=%s", build))
+        if builds is not None:
+            if not builds:
+                return
+            where_clauses.append(("build IN (%s)" %
+                                  ",".join(["%s"] * len(builds)), list(builds)))
         if name is not None:
             where_clauses.append(("name=%s", name))
         if status is not None:
@@ -648,11 +754,17 @@ class BuildStep(object):
             where = "WHERE " + " AND ".join([wc[0] for wc in where_clauses])
         else:
             where = ""
+        args = []
+        for wc in where_clauses:
+            if isinstance(wc[1], list):
+                args.extend(wc[1])
+            else:
+                args.append(wc[1])
 
         with env.db_query as db:
             cursor = db.cursor()
             cursor.execute("SELECT build,name FROM bitten_step %s ORDER BY started"
-                           % where, [wc[1] for wc in where_clauses])
+                           % where, args)
             for build, name in cursor:
                 yield BuildStep.fetch(env, build, name)
 
@@ -19,7 +19,6 @@ the next pending build, and to match build slaves against configured target
 platforms.
 """
 
-from itertools import ifilter
 import re
 import time
 
@@ -33,8 +32,46 @@ from bitten.util.repository import get_repos
 
 __docformat__ = 'restructuredtext en'
 
+# Upper bound for the number of revisions whose builds are looked up in one
+# query by `collect_changes`
+HISTORY_BATCH_SIZE = 64
 
-def collect_changes(config, authname=None):
+# Compiled platform rule patterns, keyed by the pattern string
+_PATTERN_CACHE = {}
+
+
+def _compile_pattern(pattern):
+    """Return the compiled, case-insensitive regular expression for a target
+    platform rule pattern.
+
+    Compiled patterns are cached, as are compilation errors, which are raised
+    again whenever an invalid pattern is requested.
+    """
+    compiled = _PATTERN_CACHE.get(pattern)
+    if compiled is None:
+        try:
+            compiled = re.compile(pattern, re.I)
+        except re.error, e:
+            compiled = e
+        _PATTERN_CACHE[pattern] = compiled
+    if isinstance(compiled, re.error):
+        raise compiled
+    return compiled
+
+
+def _builds_for_revs(env, config, platforms, revs):
+    """Yield ``(platform, rev, build)`` tuples for the given revisions, using a
+    single query to look up the existing builds of all of them.
+    """
+    builds = {}
+    for build in Build.select(env, config=config.name, revs=revs):
+        builds.setdefault((build.rev, build.platform), build)
+    for rev in revs:
+        for platform in platforms:
+            yield platform, rev, builds.get((str(rev), platform.id))
+
+
+def collect_changes(config, authname=None, youngest_only=False):
     """Collect all changes for a build configuration that either have already
     been built, or still need to be built.
     
@@ -44,7 +81,8 @@ def collect_changes(config, authname=None):
 
     :param config: the build configuration
     :param authname: the logged in user
-    :param db: a database connection (optional)
+    :param youngest_only: whether to stop once the youngest revision has been
+                          reported for every target platform
     """
     env = config.env
 
@@ -58,38 +96,52 @@ def collect_changes(config, authname=None):
                         repos_path, config.name, exc_info=True)
             return
 
+        platforms = list(TargetPlatform.select(env, config.name))
+        if not platforms:
+            # Nothing to report, so don't bother walking the history
+            return
+
+        # Revisions are gathered into batches so that the builds of every
+        # target platform can be looked up with one query per batch. The
+        # batch size starts small, as most callers only look at the youngest
+        # revisions.
+        revs = []
+        batch_size = 1
+        normalized_path = repos.normalize_path(repos_path)
+        min_rev, max_rev = config.min_rev, config.max_rev
+        get_node = repos.get_node
         for path, rev, chg in node.get_history():
 
             # Don't follow moves/copies
-            if path != repos.normalize_path(repos_path):
+            if path != normalized_path:
                 break
 
             # Stay within the limits of the build config
-            if config.min_rev and repos.rev_older_than(rev, config.min_rev):
+            if min_rev and repos.rev_older_than(rev, min_rev):
                 break
-            if config.max_rev and repos.rev_older_than(config.max_rev, rev):
+            if max_rev and repos.rev_older_than(max_rev, rev):
                 continue
 
             # Make sure the repository directory isn't empty at this
-            # revision
-            old_node = repos.get_node(path, rev)
-            is_empty = True
-            for entry in old_node.get_entries():
-                is_empty = False
-                break
-            if is_empty:
+            # revision (a single file being built has no entries to check)
+            old_node = get_node(path, rev)
+            if old_node.isdir and \
+                    not any(True for entry in old_node.get_entries()):
                 continue
 
-        # For every target platform, check whether there's a build
-        # of this revision
-        for platform in TargetPlatform.select(env, config.name):
-            builds = list(Build.select(env, config.name, rev, platform.id))
-            if builds:
-                build = builds[0]
-            else:
-                build = None
+            revs.append(rev)
+            if youngest_only:
+                break
+            if len(revs) >= batch_size:
+                for item in _builds_for_revs(env, config, platforms, revs):
+                    yield item
+                revs = []
+                batch_size = min(batch_size * 2, HISTORY_BATCH_SIZE)
 
-            yield platform, rev, build
+        # For every target platform, check whether there's a build
+        # of the remaining revisions
+        for item in _builds_for_revs(env, config, platforms, revs):
+            yield item
 
 
 class BuildQueue(object):
@@ -115,6 +167,19 @@ class BuildQueue(object):
         self.build_all = build_all
         self.stabilize_wait = stabilize_wait
         self.timeout = timeout
+        self._repos = {}
+
+    def _get_repos(self, path):
+        """Return the repository of a build configuration path.
+
+        Repositories are only looked up when first needed, and then reused
+        for the lifetime of the queue.
+        """
+        repos = self._repos.get(path)
+        if repos is None:
+            _name, repos, _path = get_repos(self.env, path, None)
+            self._repos[path] = repos
+        return repos
 
     # Build scheduling
 
@@ -135,13 +200,21 @@ class BuildQueue(object):
 
         # Iterate through pending builds by descending revision timestamp, to
         # avoid the first configuration/platform getting all the builds
-        platforms = [p.id for p in self.match_slave(name, properties)]
+        platforms = set([p.id for p in self.match_slave(name, properties)])
+        # Load all configurations up front instead of once per pending build
+        configs = dict((config.name, config) for config
+                       in BuildConfig.select(self.env, include_inactive=True))
         builds_to_delete = []
         build_found = False
+        # All pending builds are checked, not only those on the platforms the
+        # slave matched, so that obsolete builds get dropped by any slave
         for build in Build.select(self.env, status=Build.PENDING):
-            config_path = BuildConfig.fetch(self.env, name=build.config).path
-            _name, repos, _path = get_repos(self.env, config_path, None)
-            if self.should_delete_build(build, repos):
+            config = configs.get(build.config)
+            if config is not None:
+                repos = self._get_repos(config.path)
+            else:
+                repos = None
+            if self.should_delete_build(build, repos, config):
                 self.log.info('Scheduling build %d for deletion', build.id)
                 builds_to_delete.append(build)
             elif build.platform in platforms:
@@ -174,22 +247,21 @@ class BuildQueue(object):
         """
         platforms = []
 
-        for config in BuildConfig.select(self.env):
-            for platform in TargetPlatform.select(self.env, config=config.name):
-                match = True
-                for propname, pattern in ifilter(None, platform.rules):
-                    try:
-                        propvalue = properties.get(propname)
-                        if not propvalue or not re.match(pattern,
-                                                         propvalue, re.I):
-                            match = False
-                            break
-                    except re.error:
-                        self.log.error('Invalid platform matching pattern "%s"',
-                                       pattern, exc_info=True)
-                        match = False
-                        break
-                if match:
+        # Select the platforms of all active configurations at once, rather
+        # than issuing a query per configuration
+        configs = list(BuildConfig.select(self.env))
+        config_names = [config.name for config in configs]
+        platforms_by_config = {}
+        for platform in TargetPlatform.select(self.env, configs=config_names):
+            platforms_by_config.setdefault(platform.config, []).append(platform)
+
+        for config in configs:
+            for platform in platforms_by_config.get(config.name, []):
+                rules = self._compile_rules(platform)
+                if rules is not None and all(
+                        properties.get(propname) and
+                        regex.match(properties[propname])
+                        for propname, regex in rules):
                     self.log.debug('Slave %r matched target platform %r of '
                                    'build configuration %r', name,
                                    platform.name, config.name)
@@ -201,6 +273,23 @@ class BuildQueue(object):
 
         return platforms
 
+    def _compile_rules(self, platform):
+        """Return the rules of a target platform as ``(propname, regex)``
+        tuples, with the patterns compiled upfront.
+
+        :return: the list of compiled rules, or `None` if one of the patterns
+                 is invalid
+        """
+        rules = []
+        for propname, pattern in platform.rules:
+            try:
+                rules.append((propname, _compile_pattern(pattern)))
+            except re.error:
+                self.log.error('Invalid platform matching pattern "%s"',
+                               pattern, exc_info=True)
+                return None
+        return rules
+
     def populate(self):
         """Add a build for the next change on each build configuration to the
         queue.
@@ -212,51 +301,67 @@ class BuildQueue(object):
         """
         builds = []
 
-        for config in BuildConfig.select(self.env):
-            platforms = []
-            for platform, rev, build in collect_changes(config):
-
-                if not self.build_all and platform.id in platforms:
-                    # We've seen this platform already, so these are older
-                    # builds that should only be built if built_all=True
-                    self.log.debug('Ignoring older revisions for configuration '
-                                   '%r on %r', config.name, platform.name)
-                    break
-
-                platforms.append(platform.id)
-
-                if build is None:
-                    self.log.info('Enqueuing build of configuration "%s" at '
-                                  'revision [%s] on %s', config.name, rev,
-                                  platform.name)
-                    _repos_name, repos, _repos_path = get_repos(
-                                    self.env, config.path, None)
-
-                    rev_time = to_timestamp(repos.get_changeset(rev).date)
-                    age = int(time.time()) - rev_time
-                    if self.stabilize_wait and age < self.stabilize_wait:
-                        self.log.info('Delaying build of revision %s until %s '
-                                      'seconds pass. Current age is: %s '
-                                      'seconds' % (rev, self.stabilize_wait,
-                                      age))
-                        continue
-
-                    build = Build(self.env, config=config.name,
-                                  platform=platform.id, rev=str(rev),
-                                  rev_time=rev_time)
-                    builds.append(build)
-
-        for build in builds:
-            try:
-                build.insert()
-            except Exception, e:
-                # really only want to catch IntegrityErrors raised when
-                # a second slave attempts to add builds with the same
-                # (config, platform, rev) as an existing build.
-                self.log.info('Failed to insert build of configuration "%s" '
-                    'at revision [%s] on platform [%s]: %s',
-                    build.config, build.rev, build.platform, e)
-                raise
+        # Look up the changes of all configurations with the same database
+        # connection: while this context is open, the nested db_query and
+        # db_transaction contexts of the model classes get the connection
+        # Trac's pool has already handed to this thread, instead of
+        # checking out a connection for every query
+        with self.env.db_query:
+            for config in BuildConfig.select(self.env):
+                platforms = []
+                rev_times = {}
+                for platform, rev, build in collect_changes(config,
+                                            youngest_only=not self.build_all):
+
+                    if not self.build_all and platform.id in platforms:
+                        # We've seen this platform already, so these are older
+                        # builds that should only be built if built_all=True
+                        self.log.debug('Ignoring older revisions for '
+                                       'configuration %r on %r', config.name,
+                                       platform.name)
+                        break
+
+                    platforms.append(platform.id)
+
+                    if build is None:
+                        self.log.info('Enqueuing build of configuration '
+                                      '"%s" at revision [%s] on %s',
+                                      config.name, rev, platform.name)
+                        # The same revision is usually enqueued for several
+                        # target platforms
+                        rev_time = rev_times.get(rev)
+                        if rev_time is None:
+                            repos = self._get_repos(config.path)
+                            rev_time = to_timestamp(
+                                            repos.get_changeset(rev).date)
+                            rev_times[rev] = rev_time
+                        age = int(time.time()) - rev_time
+                        if self.stabilize_wait and age < self.stabilize_wait:
+                            self.log.info('Delaying build of revision %s '
+                                          'until %s seconds pass. Current age '
+                                          'is: %s seconds' % (rev,
+                                          self.stabilize_wait, age))
+                            continue
+
+                        build = Build(self.env, config=config.name,
+                                      platform=platform.id, rev=str(rev),
+                                      rev_time=rev_time)
+                        builds.append(build)
+
+        # Insert all new builds in a single transaction
+        with self.env.db_transaction as db:
+            for build in builds:
+                try:
+                    build.insert()
+                except Exception, e:
+                    # really only want to catch IntegrityErrors raised when
+                    # a second slave attempts to add builds with the same
+                    # (config, platform, rev) as an existing build.
+                    self.log.info('Failed to insert build of configuration '
+                        '"%s" at revision [%s] on platform [%s]: %s',
+                        build.config, build.rev, build.platform, e)
+                    raise
+        #commit
 
     def reset_orphaned_builds(self):
         """Reset all in-progress builds to ``PENDING`` state if they've been
@@ -273,7 +378,8 @@ class BuildQueue(object):
 
         with self.env.db_transaction as db:
             now = int(time.time())
-            for build in Build.select(self.env, status=Build.IN_PROGRESS):
+            orphaned = []
+            for build in list(Build.select(self.env, status=Build.IN_PROGRESS)):
                 if now - build.last_activity < self.timeout:
                     # This build has not reached the timeout yet, assume it's still
                     # being executed
@@ -283,21 +389,37 @@ class BuildQueue(object):
                                   (build.id, format_datetime(build.last_activity),
                                    pretty_timedelta(build.last_activity)))
 
-                build.status = Build.PENDING
-                build.slave = None
-                build.slave_info = {}
-                build.started = 0
-                build.stopped = 0
-                build.last_activity = 0
-                for step in list(BuildStep.select(self.env, build=build.id)):
-                    step.delete()
-                build.update()
-
                 Attachment.delete_all(self.env, 'build', build.resource.id)
+                orphaned.append(build.id)
+
+            # Look up the steps of all orphaned builds with a single query
+            for step in list(BuildStep.select(self.env, builds=orphaned)):
+                step.delete()
+
+            # Reset all orphaned builds at once instead of updating them one
+            # by one
+            if orphaned:
+                ids = ",".join(["%s"] * len(orphaned))
+                cursor = db.cursor()
+                cursor.execute("UPDATE bitten_build SET status=%s,slave='',"
+                               "started=0,stopped=0,last_activity=0 "
+                               "WHERE id IN (" + ids + ")",
+                               [Build.PENDING] + orphaned)
+                cursor.execute("DELETE FROM bitten_slave WHERE build IN (" +
+                               ids + ")", orphaned)
         #commit
 
-    def should_delete_build(self, build, repos):
-        config = BuildConfig.fetch(self.env, build.config)
+    def should_delete_build(self, build, repos, config=None):
+        """Determine whether a pending build should be dropped from the queue.
+
+        :param build: the pending build
+        :param repos: the repository of the build configuration
+        :param config: the build configuration, if already available to the
+                       caller; fetched from the database otherwise
+        :return: whether the build should be deleted
+        """
+        if config is None:
+            config = BuildConfig.fetch(self.env, build.config)
         config_name = config and config.name \
                         or 'unknown config "%s"' % build.config
 
@@ -310,7 +432,7 @@ class BuildQueue(object):
         if not platform:
             self.log.info('Dropping build of configuration "%s" at '
                      'revision [%s] on %s because the platform no longer '
-                     'exists', config.name, build.rev, platform_name)
+                     'exists', config_name, build.rev, platform_name)
             return True
 
         # Ignore pending builds for deactived build configs
@@ -332,8 +454,8 @@ class BuildQueue(object):
 
         # If not 'build_all', drop if a more recent revision is available
         if not self.build_all and \
-                len(list(Build.select(self.env, config=build.config,
-                min_rev_time=build.rev_time, platform=build.platform))) > 1:
+                Build.count(self.env, config=build.config,
+                min_rev_time=build.rev_time, platform=build.platform) > 1:
             self.log.info('Dropping build of configuration "%s" at revision [%s] '
                      'on "%s" because a more recent build exists',
                          config.name, build.rev, platform_name)
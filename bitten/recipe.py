@@ -14,11 +14,13 @@ This module provides various classes that can be used to process build recipes,
 most importantly the `Recipe` class.
 """
 
+import __builtin__
 import inspect
 import keyword
 import logging
 import os
 import time
+from collections import deque
 try:
     set
 except NameError:
@@ -34,6 +36,25 @@ __docformat__ = 'restructuredtext en'
 
 log = logging.getLogger('bitten.recipe')
 
+# Recipe command functions loaded from entry points, keyed by qualified name
+_command_cache = {}
+
+_BUILTIN_NAMES = frozenset(dir(__builtin__))
+_escaped_names = {}
+
+
+def _escape(name):
+    """Turn a recipe command attribute name into a valid Python keyword
+    argument name.
+    """
+    escaped = _escaped_names.get(name)
+    if escaped is None:
+        escaped = name.replace('-', '_')
+        if keyword.iskeyword(escaped) or escaped in _BUILTIN_NAMES:
+            escaped = escaped + '_'
+        _escaped_names[name] = escaped
+    return escaped
+
 
 class InvalidRecipeError(Exception):
     """Exception raised when a recipe is not valid."""
@@ -42,8 +63,7 @@ class InvalidRecipeError(Exception):
 class Context(object):
     """The context in which a build is executed."""
 
-    step = None # The current step
-    generator = None # The current generator (namespace#name)
+    __slots__ = ('config', 'vars', 'output', 'basedir', 'step', 'generator')
 
     def __init__(self, basedir, config=None, vars=None):
         """Initialize the context.
@@ -53,9 +73,11 @@ class Context(object):
         :param config: the build slave configuration
         :type config: `Configuration`
         """        
+        self.step = None # The current step
+        self.generator = None # The current generator (namespace#name)
         self.config = config or Configuration()
         self.vars = vars or {}
-        self.output = []
+        self.output = deque()
         self.basedir = os.path.realpath(self.config.interpolate(basedir,
                                                                 **self.vars))
         self.vars['basedir'] = self.basedir.replace('\\', '\\\\')
@@ -75,10 +97,13 @@ class Context(object):
             function = None
             qname = '#'.join(filter(None, [namespace, name]))
             if namespace:
-                group = 'bitten.recipe_commands'
-                for entry_point in WorkingSet().iter_entry_points(group, qname):
-                    function = entry_point.load()
-                    break
+                function = _command_cache.get(qname)
+                if function is None:
+                    group = 'bitten.recipe_commands'
+                    for entry_point in WorkingSet().iter_entry_points(group,
+                                                                      qname):
+                        function = _command_cache[qname] = entry_point.load()
+                        break
             elif name == 'report':
                 function = Context.report_file
             elif name == 'attach':
@@ -86,12 +111,7 @@ class Context(object):
             if not function:
                 raise InvalidRecipeError('Unknown recipe command %s' % qname)
 
-            def escape(name):
-                name = name.replace('-', '_')
-                if keyword.iskeyword(name) or name in __builtins__:
-                    name = name + '_'
-                return name
-            args = dict([(escape(name),
+            args = dict([(_escape(name),
                           self.config.interpolate(attr[name], **self.vars))
                          for name in attr])
             function_args, has_kwargs = inspect.getargspec(function)[0:3:2]
@@ -197,6 +217,8 @@ class Step(object):
     their keyword arguments.
     """
 
+    __slots__ = ('_elem', 'id', 'description', 'onerror')
+
     def __init__(self, elem, onerror_default):
         """Create the step.
         
@@ -230,7 +252,7 @@ class Step(object):
 
         errors = []
         while ctxt.output:
-            type, category, generator, output = ctxt.output.pop(0)
+            type, category, generator, output = ctxt.output.popleft()
             yield type, category, generator, output
             if type == Recipe.ERROR:
                 errors.append((generator, output))
@@ -249,6 +271,8 @@ class Recipe(object):
     they have been defined in the recipe file.
     """
 
+    __slots__ = ('ctxt', '_root', 'onerror_default')
+
     ERROR = 'error'
     LOG = 'log'
     REPORT = 'report'
@@ -296,12 +320,8 @@ class Recipe(object):
         """
         if self._root.name != 'build':
             raise InvalidRecipeError('Root element must be <build>')
-        steps = list(self._root.children())
-        if not steps:
-            raise InvalidRecipeError('Recipe defines no build steps')
-
         step_ids = set()
-        for step in steps:
+        for step in self._root.children():
             if step.name != 'step':
                 raise InvalidRecipeError('Only <step> elements allowed at '
                                          'top level of recipe')
@@ -313,11 +333,15 @@ class Recipe(object):
                                          step.attr['id'])
             step_ids.add(step.attr['id'])
 
-            cmds = list(step.children())
-            if not cmds:
-                raise InvalidRecipeError('Step "%s" has no recipe commands' %
-                                         step.attr['id'])
-            for cmd in cmds:
-                if len(list(cmd.children())):
+            has_cmds = False
+            for cmd in step.children():
+                has_cmds = True
+                if any(True for child in cmd.children()):
                     raise InvalidRecipeError('Recipe command <%s> has nested '
                                              'content' % cmd.name)
+            if not has_cmds:
+                raise InvalidRecipeError('Step "%s" has no recipe commands' %
+                                         step.attr['id'])
+
+        if not step_ids:
+            raise InvalidRecipeError('Recipe defines no build steps')
@@ -98,31 +98,35 @@ def encode_multipart_formdata(fields):
     BOUNDARY = mimetools.choose_boundary()
     ENCODE_TEMPLATE= "--%(boundary)s\r\n" \
         "Content-Disposition: form-data; name=\"%(name)s\"\r\n" \
-        "\r\n%(value)s\r\n"
+        "\r\n"
     ENCODE_TEMPLATE_FILE = "--%(boundary)s\r\n" \
         "Content-Disposition: form-data; name=\"%(name)s\"; " \
                 "filename=\"%(filename)s\"\r\n" \
         "Content-Type: %(contenttype)s\r\n" \
-        "\r\n%(value)s\r\n"
+        "\r\n"
 
-    body = ""
+    # The values (which may be the contents of large files) are kept apart
+    # from the formatted headers, so that they are only copied once when the
+    # parts are joined
+    parts = []
     for key, value in fields.iteritems():
         if isinstance(value, tuple):
             filename, value = value
-            body += ENCODE_TEMPLATE_FILE % {
+            parts.append(ENCODE_TEMPLATE_FILE % {
                         'boundary': BOUNDARY,
                         'name': str(key),
-                        'value': str(value),
                         'filename': str(filename),
                         'contenttype': 'application/octet-stream'
-                    }
+                    })
         else:
-            body += ENCODE_TEMPLATE % {
+            parts.append(ENCODE_TEMPLATE % {
                         'boundary': BOUNDARY,
-                        'name': str(key),
-                        'value': str(value)
-                    }
-    body += '--%s--\r\n' % BOUNDARY
+                        'name': str(key)
+                    })
+        parts.append(str(value))
+        parts.append('\r\n')
+    parts.append('--%s--\r\n' % BOUNDARY)
+    body = ''.join(parts)
     content_type = 'multipart/form-data; boundary=%s' % BOUNDARY
     return body, content_type
 
@@ -249,6 +253,7 @@ class BuildSlave(object):
         self.keepalive_interval = keepalive_interval
         self.dump_reports = dump_reports
         self.cookiejar = cookielib.CookieJar()
+        self._slave_xml = None
         self.username = username \
                         or self.config['authentication.username'] or ''
 
@@ -367,21 +372,27 @@ class BuildSlave(object):
         raise ExitSlave(EX_OK)
 
     def _create_build(self, url):
-        xml = xmlio.Element('slave', name=self.name, version=PROTOCOL_VERSION)[
-            xmlio.Element('platform', processor=self.config['processor'])[
-                self.config['machine']
-            ],
-            xmlio.Element('os', family=self.config['family'],
-                                version=self.config['version'])[
-                self.config['os']
-            ],
-        ]
-
-        log.debug('Configured packages: %s', self.config.packages)
-        for package, properties in self.config.packages.items():
-            xml.append(xmlio.Element('package', name=package, **properties))
-
-        body = str(xml)
+        # The slave configuration does not change while the slave is running,
+        # so the description sent to the masters is only generated once
+        body = self._slave_xml
+        if body is None:
+            xml = xmlio.Element('slave', name=self.name,
+                                version=PROTOCOL_VERSION)[
+                xmlio.Element('platform', processor=self.config['processor'])[
+                    self.config['machine']
+                ],
+                xmlio.Element('os', family=self.config['family'],
+                                    version=self.config['version'])[
+                    self.config['os']
+                ],
+            ]
+
+            log.debug('Configured packages: %s', self.config.packages)
+            for package, properties in self.config.packages.items():
+                xml.append(xmlio.Element('package', name=package,
+                                         **properties))
+
+            body = self._slave_xml = str(xml)
         log.debug('Sending slave configuration: %s', body)
         resp = self.request('POST', url, body, {
             'Content-Length': str(len(body)),
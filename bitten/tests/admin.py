@@ -134,6 +134,7 @@ class BuildMasterAdminPageProviderTestCase(unittest.TestCase):
             self.assertEqual(60, section.getint('slave_timeout'))
             self.assertEqual(True, section.getbool('adjust_timestamps'))
             self.assertEqual(False, section.getbool('build_all'))
+            self.assertEqual('log/bitten', section.get('logs_dir'))
 
 
 class BuildConfigurationsAdminPageProviderTestCase(unittest.TestCase):
@@ -295,6 +296,8 @@ class BuildConfigurationsAdminPageProviderTestCase(unittest.TestCase):
                              redirected_to[0])
             config = BuildConfig.fetch(self.env, name='foo')
             self.assertEqual(True, config.active)
+            config = BuildConfig.fetch(self.env, name='bar')
+            self.assertEqual(False, config.active)
 
     def test_process_deactivate_config(self):
         BuildConfig(self.env, name='foo', path='branches/foo',
@@ -397,6 +400,20 @@ class BuildConfigurationsAdminPageProviderTestCase(unittest.TestCase):
                              'digits, periods, or dashes.', e.message)
             self.assertEqual('Add Configuration', e.title)
 
+    def test_process_add_config_name_trailing_newline(self):
+        req = Mock(method='POST', perm=PermissionCache(self.env, 'joe'),
+                   chrome={'warnings': []}, href=Href('/'), authname='joe',
+                   args={'add': '', 'name': 'foo\n'})
+
+        provider = BuildConfigurationsAdminPageProvider(self.env)
+        try:
+            provider.render_admin_panel(req, 'bitten', 'configs', '')
+            self.fail('Expected TracError')
+
+        except TracError, e:
+            self.assertEqual('The field "name" may only contain letters, '
+                             'digits, periods, or dashes.', e.message)
+
     def test_new_config_submit_with_invalid_path(self):
         req = Mock(method='POST', perm=PermissionCache(self.env, 'joe'),
                    authname='joe',
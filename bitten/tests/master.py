@@ -87,6 +87,7 @@ class BuildMasterTestCase(unittest.TestCase):
 
         self.repos = Mock(
             get_node=lambda path, rev=None: Mock(
+                isdir=True,
                 get_entries=lambda: [Mock(), Mock()],
                 get_history=lambda: [('somepath', 123, 'edit'),
                                      ('somepath', 121, 'edit'),
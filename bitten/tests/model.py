@@ -220,6 +220,29 @@ class TargetPlatformTestCase(BaseModelTestCase):
             platforms = list(TargetPlatform.select(self.env, config='test'))
             self.assertEqual(2, len(platforms))
 
+    def test_select_rules(self):
+        platform = TargetPlatform(self.env, config='test', name='Windows')
+        platform.rules += [(Build.OS_NAME, 'Windows'), (Build.OS_VERSION, 'XP')]
+        platform.insert()
+        platform = TargetPlatform(self.env, config='test', name='Linux')
+        platform.rules.append((Build.OS_NAME, 'Linux'))
+        platform.insert()
+        platform = TargetPlatform(self.env, config='other', name='Mac OS X')
+        platform.rules.append((Build.OS_NAME, 'Darwin'))
+        platform.insert()
+
+        platforms = list(TargetPlatform.select(self.env, config='test'))
+        self.assertEqual(['Linux', 'Windows'], [p.name for p in platforms])
+        self.assertEqual([(Build.OS_NAME, 'Linux')], platforms[0].rules)
+        self.assertEqual([(Build.OS_NAME, 'Windows'),
+                          (Build.OS_VERSION, 'XP')], platforms[1].rules)
+
+        platforms = list(TargetPlatform.select(self.env,
+                                               configs=['other', 'missing']))
+        self.assertEqual(['Mac OS X'], [p.name for p in platforms])
+        self.assertEqual([(Build.OS_NAME, 'Darwin')], platforms[0].rules)
+        self.assertEqual([], list(TargetPlatform.select(self.env, configs=[])))
+
 
 class BuildTestCase(BaseModelTestCase):
 
@@ -319,6 +342,75 @@ class BuildTestCase(BaseModelTestCase):
         build.status = Build.FAILURE
         build.update()
 
+    def test_select_slave_info(self):
+        with self.env.db_transaction as db:
+            cursor = db.cursor()
+            for rev, rev_time in (('42', 12039), ('43', 12040)):
+                cursor.execute("INSERT INTO bitten_build (config,rev,rev_time,"
+                               "platform,slave,started,stopped,status) "
+                               "VALUES (%s,%s,%s,%s,%s,%s,%s,%s)",
+                               ('test', rev, rev_time, 1, 'tehbox', 15006,
+                                16007, Build.SUCCESS))
+            build_id = db.get_last_id(cursor, 'bitten_build')
+            cursor.executemany("INSERT INTO bitten_slave VALUES (%s,%s,%s)",
+                               [(build_id, Build.IP_ADDRESS, '127.0.0.1'),
+                                (build_id, Build.MAINTAINER, 'joe@example.org')])
+
+        builds = list(Build.select(self.env, config='test'))
+        self.assertEqual(2, len(builds))
+        self.assertEqual(build_id, builds[0].id)
+        self.assertEqual('43', builds[0].rev)
+        self.assertEqual(12040, builds[0].rev_time)
+        self.assertEqual(1, builds[0].platform)
+        self.assertEqual('tehbox', builds[0].slave)
+        self.assertEqual(15006, builds[0].started)
+        self.assertEqual(16007, builds[0].stopped)
+        self.assertEqual(Build.SUCCESS, builds[0].status)
+        self.assertEqual({Build.IP_ADDRESS: '127.0.0.1',
+                          Build.MAINTAINER: 'joe@example.org'},
+                         builds[0].slave_info)
+        self.assertEqual({}, builds[1].slave_info)
+
+    def test_select_slave_info_many_builds(self):
+        with self.env.db_transaction as db:
+            cursor = db.cursor()
+            for rev_time in range(250):
+                cursor.execute("INSERT INTO bitten_build (config,rev,rev_time,"
+                               "platform,status) VALUES (%s,%s,%s,%s,%s)",
+                               ('test', str(rev_time), rev_time, 1,
+                                Build.SUCCESS))
+                build_id = db.get_last_id(cursor, 'bitten_build')
+                cursor.execute("INSERT INTO bitten_slave VALUES (%s,%s,%s)",
+                               (build_id, Build.OS_NAME, 'os%d' % rev_time))
+
+        builds = list(Build.select(self.env, config='test'))
+        self.assertEqual(250, len(builds))
+        for build in builds:
+            self.assertEqual({Build.OS_NAME: 'os%d' % build.rev_time},
+                             build.slave_info)
+
+    def test_select_revs(self):
+        for rev, rev_time in (('42', 12039), ('43', 12040), ('44', 12041)):
+            Build(self.env, config='test', rev=rev, rev_time=rev_time,
+                  platform=1).insert()
+
+        builds = list(Build.select(self.env, config='test', revs=[42, '44']))
+        self.assertEqual(['44', '42'], [build.rev for build in builds])
+        self.assertEqual([], list(Build.select(self.env, revs=[])))
+
+    def test_count(self):
+        for rev, rev_time, platform in (('42', 12039, 1), ('43', 12040, 1),
+                                        ('44', 12041, 2)):
+            Build(self.env, config='test', rev=rev, rev_time=rev_time,
+                  platform=platform).insert()
+
+        self.assertEqual(3, Build.count(self.env))
+        self.assertEqual(3, Build.count(self.env, config='test'))
+        self.assertEqual(0, Build.count(self.env, config='other'))
+        self.assertEqual(2, Build.count(self.env, platform=1))
+        self.assertEqual(1, Build.count(self.env, platform=1,
+                                        min_rev_time=12040))
+
 
 class BuildStepTestCase(BaseModelTestCase):
 
@@ -411,6 +503,18 @@ class BuildStepTestCase(BaseModelTestCase):
         self.assertEqual('Foo baz', steps[1].description)
         self.assertEqual(BuildStep.FAILURE, steps[1].status)
 
+    def test_select_builds(self):
+        with self.env.db_transaction as db:
+            cursor = db.cursor()
+            cursor.executemany("INSERT INTO bitten_step VALUES (%s,%s,%s,%s,%s,%s)",
+                               [(1, 'test', 'Foo bar', BuildStep.SUCCESS, 1, 2),
+                                (2, 'test', 'Foo baz', BuildStep.FAILURE, 2, 3),
+                                (3, 'test', 'Foo qux', BuildStep.SUCCESS, 3, 4)])
+
+        steps = list(BuildStep.select(self.env, builds=[1, 3]))
+        self.assertEqual([1, 3], [step.build for step in steps])
+        self.assertEqual([], list(BuildStep.select(self.env, builds=[])))
+
 
 class BuildLogTestCase(BaseModelTestCase):
 
@@ -82,6 +82,7 @@ class CollectChangesTestCase(unittest.TestCase):
 
     def test_stop_on_minrev(self):
         self.repos.get_node=lambda path, rev=None: Mock(
+                isdir=True,
                 get_entries=lambda: [Mock(), Mock()],
                 get_history=lambda: [('somepath', 123, 'edit'),
                                      ('somepath', 121, 'edit'),
@@ -98,6 +99,7 @@ class CollectChangesTestCase(unittest.TestCase):
 
     def test_skip_until_maxrev(self):
         self.repos.get_node=lambda path, rev=None: Mock(
+                isdir=True,
                 get_entries=lambda: [Mock(), Mock()],
                 get_history=lambda: [('somepath', 123, 'edit'),
                                      ('somepath', 121, 'edit'),
@@ -117,10 +119,12 @@ class CollectChangesTestCase(unittest.TestCase):
         def _mock_get_node(path, rev=None):
             if rev and rev == 121:
                 return Mock(
+                    isdir=True,
                     get_entries=lambda: []
                 )
             else:
                 return Mock(
+                    isdir=True,
                     get_entries=lambda: [Mock(), Mock()],
                     get_history=lambda: [('somepath', 123, 'edit'),
                                          ('somepath', 121, 'edit'),
@@ -136,6 +140,66 @@ class CollectChangesTestCase(unittest.TestCase):
         self.assertEqual(123, retval[0][1])
         self.assertEqual(120, retval[1][1])
 
+    def test_file_path(self):
+        def _get_entries():
+            raise AssertionError('Entries of a file should not be listed')
+        self.repos.get_node=lambda path, rev=None: Mock(
+                isdir=False,
+                get_entries=_get_entries,
+                get_history=lambda: [('somepath', 123, 'edit'),
+                                     ('somepath', 121, 'edit')])
+        self.repos.normalize_path=lambda path: path
+        self.repos.rev_older_than=lambda rev1, rev2: rev1 < rev2
+
+        retval = list(collect_changes(self.config))
+        self.assertEqual([123, 121], [rev for p, rev, b in retval])
+
+    def test_youngest_only(self):
+        def _mock_get_node(path, rev=None):
+            if rev and rev == 123:
+                return Mock(
+                    isdir=True,
+                    get_entries=lambda: []
+                )
+            else:
+                return Mock(
+                    isdir=True,
+                    get_entries=lambda: [Mock(), Mock()],
+                    get_history=lambda: [('somepath', 123, 'edit'),
+                                         ('somepath', 121, 'edit'),
+                                         ('somepath', 120, 'edit')]
+                )
+
+        self.repos.get_node=_mock_get_node
+        self.repos.normalize_path=lambda path: path
+        self.repos.rev_older_than=lambda rev1, rev2: rev1 < rev2
+        TargetPlatform(self.env, config='test', name='Bar').insert()
+
+        retval = list(collect_changes(self.config, youngest_only=True))
+        self.assertEqual(2, len(retval))
+        self.assertEqual(['Bar', 'Foo'], [p.name for p, rev, b in retval])
+        self.assertEqual([121, 121], [rev for p, rev, b in retval])
+
+    def test_existing_builds(self):
+        self.repos.get_node=lambda path, rev=None: Mock(
+                isdir=True,
+                get_entries=lambda: [Mock(), Mock()],
+                get_history=lambda: [('somepath', 123, 'edit'),
+                                     ('somepath', 121, 'edit'),
+                                     ('somepath', 120, 'edit')])
+        self.repos.normalize_path=lambda path: path
+        self.repos.rev_older_than=lambda rev1, rev2: rev1 < rev2
+
+        build = Build(self.env, config='test', platform=self.platform.id,
+                      rev=121, rev_time=42)
+        build.insert()
+
+        retval = list(collect_changes(self.config))
+        self.assertEqual(3, len(retval))
+        self.assertEqual(None, retval[0][2])
+        self.assertEqual(build.id, retval[1][2].id)
+        self.assertEqual(None, retval[2][2])
+
 
 class BuildQueueTestCase(unittest.TestCase):
 
@@ -225,10 +289,33 @@ class BuildQueueTestCase(unittest.TestCase):
         build = queue.get_build_for_slave('foobar', {})
         self.assertEqual(None, build)
 
+    def test_next_pending_build_deletes_other_platform_inactive_config(self):
+        """
+        Make sure that pending builds of a deactivated build config are
+        dropped even when polled by a slave that doesn't match their platform.
+        """
+        BuildConfig(self.env, 'test', active=True).insert()
+        platform = TargetPlatform(self.env, config='test', name='Foo')
+        platform.insert()
+        BuildConfig(self.env, 'inactive').insert()
+        other = TargetPlatform(self.env, config='inactive', name='Bar')
+        other.rules.append(('family', 'nt'))
+        other.insert()
+        build = Build(self.env, config='inactive', platform=other.id,
+                      rev=123, rev_time=42, status=Build.PENDING)
+        build.insert()
+        build_id = build.id
+
+        queue = BuildQueue(self.env)
+        build = queue.get_build_for_slave('foobar', {'family': 'posix'})
+        self.assertEqual(None, build)
+        self.assertEqual(None, Build.fetch(self.env, build_id))
+
     def test_populate_not_build_all(self):
         self.repos.get_changeset = lambda rev: Mock(
                                             date=to_datetime(rev * 1000, utc))
         self.repos.get_node = lambda path, rev=None: Mock(
+                isdir=True,
                 get_entries=lambda: [Mock(), Mock()],
                 get_history=lambda: [('somepath', 123, 'edit'),
                                      ('somepath', 121, 'edit'),
@@ -259,6 +346,7 @@ class BuildQueueTestCase(unittest.TestCase):
         self.repos.get_changeset=lambda rev: Mock(
                                             date=to_datetime(rev * 1000, utc))
         self.repos.get_node=lambda path, rev=None: Mock(
+                isdir=True,
                 get_entries=lambda: [Mock(), Mock()],
                 get_history=lambda: [('somepath', 123, 'edit'),
                                      ('somepath', 121, 'edit'),
@@ -304,6 +392,7 @@ class BuildQueueTestCase(unittest.TestCase):
         self.repos.get_changeset=lambda rev: Mock(
                                         date=to_datetime(rev * 1000, utc))
         self.repos.get_node=lambda path, rev=None: Mock(
+                isdir=True,
                 get_entries=lambda: [Mock(), Mock()],
                 get_history=get_history)
         self.repos.normalize_path=lambda path: path
@@ -390,6 +479,24 @@ class BuildQueueTestCase(unittest.TestCase):
         self.assertTrue("configuration is deactivated" in out[0])
         self.assertEquals('unknown config "does_not_exist"', out[1])
 
+    def test_should_delete_build_config_and_platform_none(self):
+        out = []
+        self.env.log = Mock(
+                        info=lambda msg, *args: out.extend([msg] + list(args)))
+        build = Build(self.env, config='does_not_exist', rev=42,
+                        platform=99, rev_time=123456)
+        build.insert()
+        build_id = build.id
+        queue = BuildQueue(self.env, build_all=True)
+
+        self.assertEqual(True, queue.should_delete_build(build, None))
+        self.assertTrue("platform no longer exists" in out[0])
+        self.assertEquals('unknown config "does_not_exist"', out[1])
+
+        # the same build must also be dropped when a slave polls
+        self.assertEqual(None, queue.get_build_for_slave('foobar', {}))
+        self.assertEqual(None, Build.fetch(self.env, build_id))
+
     def test_should_delete_build_outside_revision_range(self):
         messages = []
         self.env.log = Mock(info=lambda msg, *args: messages.append(msg))
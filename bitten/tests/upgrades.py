@@ -21,8 +21,11 @@ from bitten.upgrades import update_sequence, drop_index
 from bitten import upgrades, main, model
 
 import os
+import re
 import shutil
+import sys
 import tempfile
+from StringIO import StringIO
 
 
 class BaseUpgradeTestCase(unittest.TestCase):
@@ -85,6 +88,9 @@ class UpgradeHelperTestCase(BaseUpgradeTestCase):
             Column('id', type='int'), Column('name', size=20),
             Index(['name'])
         ],
+        Table('test_update_sequences', key='id')[
+            Column('id', auto_increment=True), Column('name'),
+        ],
     ]
 
     def test_update_sequence(self):
@@ -104,6 +110,28 @@ class UpgradeHelperTestCase(BaseUpgradeTestCase):
             row = cursor.fetchone()
             self.assertEqual(row[0], 4)
 
+    def test_update_sequences(self):
+        with self.env.db_transaction as db:
+            cursor = db.cursor()
+
+            for tbl, rowids in [('test_update_sequence', [1, 2, 3]),
+                                ('test_update_sequences', [5, 6])]:
+                for rowid in rowids:
+                    cursor.execute("INSERT INTO %s (id, name) VALUES (%%s, %%s)"
+                        % tbl, (rowid, 'x'))
+            upgrades.update_sequences(self.env, db,
+                [('test_update_sequence', 'id'),
+                 ('test_update_sequences', 'id')])
+
+            for tbl, expected in [('test_update_sequence', 4),
+                                  ('test_update_sequences', 7)]:
+                cursor.execute("INSERT INTO %s (name) VALUES (%%s)" % tbl,
+                    ('new',))
+                cursor.execute("SELECT id FROM %s WHERE name = %%s" % tbl,
+                    ('new',))
+                row = cursor.fetchone()
+                self.assertEqual(row[0], expected)
+
     def test_drop_index(self):
         with self.env.db_transaction as db:
             cursor = db.cursor()
@@ -400,6 +428,30 @@ class UpgradeScriptsTestCase(BaseUpgradeTestCase):
         self.assertTrue(logs[1].getMessage().startswith(
             "Deleted stray log levels file 2.log.levels"))
 
+    def test_add_config_platform_rev_index_with_duplicates(self):
+        self._insert_data([
+            ['bitten_build',
+                ('id', 'config', 'rev', 'platform', 'rev_time'), [
+                    (12, 'test_config', '123', 1, 456),
+                    (13, 'test_config', '123', 1, 456),
+                    (14, 'test_config', '124', 1, 457),
+                ]
+            ],
+        ])
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            with self.env.db_transaction as db:
+                self.assertRaises(TracError,
+                    upgrades.add_config_platform_rev_index_to_build,
+                    self.env, db)
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        self.assertTrue(re.search(r"test_config, 123, 1 :: \[12L?, 13L?\]",
+                                  output))
+        self.assertTrue("test_config, 124" not in output)
+
     def test_migrate_logs_to_files_with_logs_dir(self):
         os.makedirs(self.logs_dir)
         self.assertRaises(TracError, upgrades.migrate_logs_to_files,
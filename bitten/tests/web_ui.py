@@ -106,7 +106,7 @@ class BuildConfigControllerTestCase(AbstractWebUITestCase):
                    chrome={}, authname='joe',
                    perm=PermissionCache(self.env, 'joe'))
 
-        root = Mock(get_entries=lambda: ['foo'],
+        root = Mock(isdir=True, get_entries=lambda: ['foo'],
                     get_history=lambda: [('trunk', rev, 'edit') for rev in
                                           range(123, 111, -1)])
         self.repos.get_node=lambda path, rev=None: root
@@ -145,7 +145,7 @@ class BuildConfigControllerTestCase(AbstractWebUITestCase):
         # revisions are intentionally not sorted in any way - bitten should just keep them!
         revision_ids = [5, 8, 2]
         revision_list = [('trunk', revision, 'edit') for revision in revision_ids]
-        root = Mock(get_entries=lambda: ['foo'], get_history=lambda: revision_list)
+        root = Mock(isdir=True, get_entries=lambda: ['foo'], get_history=lambda: revision_list)
         self.repos.get_node=lambda path, rev=None: root
         self.repos.youngest_rev=5
         self.repos.get_changeset=lambda rev: Mock(author='joe', date=99)
@@ -169,7 +169,7 @@ class BuildConfigControllerTestCase(AbstractWebUITestCase):
                    chrome={}, authname='joe',
                    perm=PermissionCache(self.env, 'joe'))
 
-        root = Mock(get_entries=lambda: ['foo'],
+        root = Mock(isdir=True, get_entries=lambda: ['foo'],
                     get_history=lambda: [('trunk', rev, 'edit') for rev in
                                           range(123, 110, -1)])
         self.repos.get_node=lambda path, rev=None: root
@@ -219,7 +219,7 @@ class BuildControllerTestCase(AbstractWebUITestCase):
                    chrome={}, authname='joe',
                    perm=PermissionCache(self.env, 'joe'))
 
-        root = Mock(get_entries=lambda: ['foo'],
+        root = Mock(isdir=True, get_entries=lambda: ['foo'],
                     get_history=lambda: [('trunk', rev, 'edit') for rev in
                                           range(123, 111, -1)])
         self.repos.get_node=lambda path, rev=None: root
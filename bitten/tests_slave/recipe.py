@@ -14,7 +14,7 @@ import tempfile
 import unittest
 
 from bitten.build.config import Configuration
-from bitten.recipe import Context, Recipe, InvalidRecipeError
+from bitten.recipe import Context, Recipe, InvalidRecipeError, _escape
 from bitten.util import xmlio
 
 
@@ -45,6 +45,12 @@ class ContextTestCase(unittest.TestCase):
         except InvalidRecipeError, e:
             self.failUnless("Unsupported argument 'foo'" in str(e))
 
+    def test_escape_argument_names(self):
+        self.assertEqual('file_', _escape('file'))
+        self.assertEqual('class_', _escape('class'))
+        self.assertEqual('keep_going', _escape('keep-going'))
+        self.assertEqual('path', _escape('path'))
+
     def test_attach_file_config(self):
         # Verify output from attaching a file to a config
         ctxt = Context(self.basedir, Configuration())
@@ -103,6 +103,24 @@ class BuildSlaveTestCase(unittest.TestCase):
         self.assertEqual(str(msg).decode("utf-8"),
             u'<message level="info">\uFFFD</message>')
 
+    def test_create_build_slave_xml_generated_once(self):
+        slave = BuildSlave(['http://example.org/trac'], name='tehbox',
+                           work_dir=self.work_dir)
+        bodies = []
+        def request(method, url, body=None, headers=None):
+            bodies.append(body)
+            return DummyResponse(204)
+        slave.request = request
+
+        url = 'http://example.org/trac/builds'
+        self.assertEqual(False, slave._create_build(url))
+        self.assertEqual(False, slave._create_build(url))
+        self.assertEqual(2, len(bodies))
+        self.failUnless(bodies[0] is bodies[1])
+        xml = xmlio.parse(bodies[0])
+        self.assertEqual('slave', xml.name)
+        self.assertEqual('tehbox', xml.attr['name'])
+
 class MultiPartEncodeTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -15,6 +15,8 @@ in the Trac environment.
 
 import os
 import sys
+from itertools import groupby, islice
+from operator import itemgetter
 
 from trac.core import TracError
 from trac.db import DatabaseManager, Table, Column, Index
@@ -34,14 +36,22 @@ def parse_scheme(env):
 
 def update_sequence(env, db, tbl, col):
     """Update a sequence associated with an autoincrement column."""
+    update_sequences(env, db, [(tbl, col)])
+
+def update_sequences(env, db, columns):
+    """Update the sequences associated with several autoincrement columns
+    in a single statement.
+
+    :param columns: a list of ``(table, column)`` tuples
+    """
     # Hopefully Trac will eventually implement its own version
     # of this function.
     scheme = parse_scheme(env)
     if scheme == "postgres":
-        seq = '%s_%s_seq' % (tbl, col)
         cursor = db.cursor()
-        cursor.execute("SELECT setval('%s', (SELECT MAX(%s) FROM %s))"
-            % (seq, col, tbl))
+        cursor.execute("SELECT " + ", ".join([
+            "setval('%s_%s_seq', (SELECT MAX(%s) FROM %s))"
+            % (tbl, col, col, tbl) for tbl, col in columns]))
 
 def drop_index(env, db, tbl, idx):
     """Drop an index associated with a table."""
@@ -93,10 +103,16 @@ def add_log_table(env, db):
         update_cursor.execute("INSERT INTO bitten_log (build, step) "
                 "VALUES (%s,%s)", (build, step))
         log_id = db.get_last_id(update_cursor, 'bitten_log')
-        messages = [(log_id, line, INFO_LEVEL, msg)
-            for line, msg in enumerate(log.splitlines())]
-        update_cursor.executemany("INSERT INTO bitten_log_message (log, line, level, message) "
-            "VALUES (%s, %s, %s, %s)", messages)
+        # Insert long logs in batches rather than building the rows for all
+        # of their lines at once
+        lines = enumerate(log.splitlines())
+        while True:
+            messages = [(log_id, line, INFO_LEVEL, msg)
+                for line, msg in islice(lines, 1000)]
+            if not messages:
+                break
+            update_cursor.executemany("INSERT INTO bitten_log_message (log, line, level, message) "
+                "VALUES (%s, %s, %s, %s)", messages)
 
     cursor.execute("CREATE TEMPORARY TABLE old_step AS SELECT * FROM bitten_step")
     cursor.execute("DROP TABLE bitten_step")
@@ -134,30 +150,12 @@ def add_last_activity_to_build(env, db):
     """Add a column for storing the last activity to the build table."""
     cursor = db.cursor()
 
-    build_table_schema_v12 = Table('bitten_build', key='id')[
-            Column('id', auto_increment=True), Column('config'), Column('rev'),
-            Column('rev_time', type='int'), Column('platform', type='int'),
-            Column('slave'), Column('started', type='int'),
-            Column('stopped', type='int'), Column('status', size=1),
-            Column('last_activity', type='int'),
-            Index(['config', 'rev', 'platform'], unique=True)
-        ]
-
-    cursor.execute("CREATE TEMPORARY TABLE old_build_v11 AS "
-                   "SELECT * FROM bitten_build")
-    cursor.execute("DROP TABLE bitten_build")
-
-    connector, _ = DatabaseManager(env)._get_connector()
-    for stmt in connector.to_sql(build_table_schema_v12):
-        cursor.execute(stmt)
+    # Add the column in place instead of copying the whole (potentially
+    # large) build table through a temporary table
+    cursor.execute("ALTER TABLE bitten_build ADD COLUMN last_activity int")
 
     # it's safe to make the last activity the stop time of the build
-    cursor.execute("INSERT INTO bitten_build (id,config,rev,rev_time,platform,"
-                   "slave,started,stopped,last_activity,status) "
-                   "SELECT id,config,rev,rev_time,platform,"
-                   "slave,started,stopped,stopped,status FROM old_build_v11")
-
-    update_sequence(env, db, 'bitten_build', 'id')
+    cursor.execute("UPDATE bitten_build SET last_activity=stopped")
 
 def add_config_to_reports(env, db):
     """Add the name of the build configuration as metadata to report documents
@@ -184,6 +182,12 @@ def add_config_to_reports(env, db):
 
     container.addIndex(xtn, '', 'config', 'node-metadata-equality-string', uc)
 
+    # Look up the configuration of all builds at once instead of querying
+    # the database for every report document
+    cursor = db.cursor()
+    cursor.execute("SELECT id, config FROM bitten_build")
+    build_configs = dict(cursor.fetchall())
+
     qc = mgr.createQueryContext()
     for value in mgr.query(xtn, 'collection("%s")/report' % dbfile, qc):
         doc = value.asDocument()
@@ -191,12 +195,9 @@ def add_config_to_reports(env, db):
         if doc.getMetaData('', 'build', metaval):
             build_id = int(metaval.asNumber())
 
-            cursor = db.cursor()
-            cursor.execute("SELECT config FROM bitten_build WHERE id=%s", (build_id,))
-            row = cursor.fetchone()
-
-            if row:
-                doc.setMetaData('', 'config', dbxml.XmlValue(row[0]))
+            if build_id in build_configs:
+                doc.setMetaData('', 'config',
+                                dbxml.XmlValue(build_configs[build_id]))
                 container.updateDocument(xtn, doc, uc)
             else:
                 # an orphaned report, for whatever reason... just remove it
@@ -307,6 +308,17 @@ def xmldb_to_db(env, db):
                 item[child_elem.name] = child_elem.gettext()
             yield item
 
+    report_types = {'pylint':   ('lint', get_pylint_items),
+                    'trace':    ('coverage', get_trace_items),
+                    'unittest': ('test', get_unittest_items)}
+
+    # Look up the reports that already exist once, rather than querying for
+    # each report in the container
+    cursor = db.cursor()
+    cursor.execute("SELECT build,step,category FROM bitten_report "
+                   "WHERE build IS NOT NULL AND step IS NOT NULL")
+    existing = set(cursor.fetchall())
+
     qc = mgr.createQueryContext()
     for value in mgr.query(xtn, 'collection("%s")/report' % dbfile, qc, 0):
         doc = value.asDocument()
@@ -317,9 +329,6 @@ def xmldb_to_db(env, db):
         if doc.getMetaData('', 'step', metaval):
             step = metaval.asString()
 
-        report_types = {'pylint':   ('lint', get_pylint_items),
-                        'trace':    ('coverage', get_trace_items),
-                        'unittest': ('test', get_unittest_items)}
         xml = xmlio.parse(value.asString())
         report_type = xml.attr['type']
         category, get_items = report_types[report_type]
@@ -328,25 +337,27 @@ def xmldb_to_db(env, db):
 
         items = list(get_items(xml))
 
-        cursor = db.cursor()
-        cursor.execute("SELECT bitten_report.id FROM bitten_report "
-                       "WHERE build=%s AND step=%s AND category=%s",
-                       (build, step, category))
-        rows = cursor.fetchall()
-        if rows:
+        report_key = (build, step and to_unicode(step), category)
+        if report_key in existing:
             # Duplicate report, skip
             continue
+        if build is not None and step is not None:
+            existing.add(report_key)
 
         cursor.execute("INSERT INTO bitten_report "
                        "(build,step,category,generator) VALUES (%s,%s,%s,%s)",
                        (build, step, category, report_type))
         id = db.get_last_id(cursor, 'bitten_report')
 
+        # Insert the values of all items into each item table at once
+        values_by_key = {}
         for idx, item in enumerate(items):
             for key, value in item.items():
-                cursor.execute("INSERT INTO bitten_report_item_" + key + " "
+                values_by_key.setdefault(key, []).append((id, idx, value))
+        for key, values in values_by_key.items():
+            cursor.executemany("INSERT INTO bitten_report_item_" + key + " "
                                "(report,item,value) VALUES (%s,%s,%s)",
-                               (id, idx, value))
+                               values)
 
     sys.stderr.write('\n')
     sys.stderr.flush()
@@ -358,13 +369,10 @@ def xmldb_to_db(env, db):
 def normalize_file_paths(env, db):
     """Normalize the file separator in file names in reports."""
     cursor = db.cursor()
-    cursor.execute("SELECT report,item,value FROM bitten_report_item_file")
-    rows = cursor.fetchall() or []
-    for report, item, value in rows:
-        if '\\' in value:
-            cursor.execute("UPDATE bitten_report_item_file SET value=%s "
-                           "WHERE report=%s AND item=%s",
-                           (value.replace('\\', '/'), report, item))
+    cursor.execute("UPDATE bitten_report_item_file "
+                   "SET value=REPLACE(value,%s,%s) "
+                   "WHERE value<>REPLACE(value,%s,%s)",
+                   ('\\', '/', '\\', '/'))
 
 def fixup_generators(env, db):
     """Upgrade the identifiers for the recipe commands that generated log
@@ -377,24 +385,18 @@ def fixup_generators(env, db):
         'exec_': 'http://bitten.edgewall.org/tools/python#exec' # Ambigious
     }
     cursor = db.cursor()
-    cursor.execute("SELECT id,generator FROM bitten_log "
-                   "WHERE generator IN (%s)"
-                   % ','.join([repr(key) for key in mapping.keys()]))
-    for log_id, generator in cursor:
+    for old_generator, generator in mapping.items():
         cursor.execute("UPDATE bitten_log SET generator=%s "
-                       "WHERE id=%s", (mapping[generator], log_id))
+                       "WHERE generator=%s", (generator, old_generator))
 
     mapping = {
         'unittest': 'http://bitten.edgewall.org/tools/python#unittest',
         'trace': 'http://bitten.edgewall.org/tools/python#trace',
         'pylint': 'http://bitten.edgewall.org/tools/python#pylint'
     }
-    cursor.execute("SELECT id,generator FROM bitten_report "
-                   "WHERE generator IN (%s)"
-                   % ','.join([repr(key) for key in mapping.keys()]))
-    for report_id, generator in cursor:
+    for old_generator, generator in mapping.items():
         cursor.execute("UPDATE bitten_report SET generator=%s "
-                       "WHERE id=%s", (mapping[generator], report_id))
+                       "WHERE generator=%s", (generator, old_generator))
 
 def add_error_table(env, db):
     """Add the bitten_error table for recording step failure reasons."""
@@ -412,23 +414,8 @@ def add_filename_to_logs(env, db):
     """Add filename column to log table to save where log files are stored."""
     cursor = db.cursor()
 
-    build_log_schema_v9 = Table('bitten_log', key='id')[
-            Column('id', auto_increment=True), Column('build', type='int'),
-            Column('step'), Column('generator'), Column('orderno', type='int'),
-            Column('filename'),
-            Index(['build', 'step'])
-        ]
-
-    cursor.execute("CREATE TEMPORARY TABLE old_log_v8 AS "
-                   "SELECT * FROM bitten_log")
-    cursor.execute("DROP TABLE bitten_log")
-
-    connector, _ = DatabaseManager(env)._get_connector()
-    for stmt in connector.to_sql(build_log_schema_v9):
-        cursor.execute(stmt)
-
-    cursor.execute("INSERT INTO bitten_log (id,build,step,generator,orderno,filename) "
-                   "SELECT id,build,step,generator,orderno,'' FROM old_log_v8")
+    cursor.execute("ALTER TABLE bitten_log ADD COLUMN filename text")
+    cursor.execute("UPDATE bitten_log SET filename=''")
 
 def migrate_logs_to_files(env, db):
     """Migrates logs that are stored in the bitten_log_messages table into files."""
@@ -444,24 +431,55 @@ def migrate_logs_to_files(env, db):
 
     os.makedirs(logs_dir)
 
+    def open_log_files(log_id):
+        full_filename = os.path.join(logs_dir, "%s.log" % (log_id,))
+        # Note: the original version of this code erroneously wrote to filename + ".level" instead of ".levels", producing unused level files
+        return (codecs.open(full_filename, "wb", "UTF-8"),
+                codecs.open(full_filename + '.levels', "wb", "UTF-8"))
+
     cursor = db.cursor()
-    message_cursor = db.cursor()
-    update_cursor = db.cursor()
     cursor.execute("SELECT id FROM bitten_log")
-    for log_id, in cursor.fetchall():
-        filename = "%s.log" % (log_id,)
-        message_cursor.execute("SELECT message, level FROM bitten_log_message WHERE log=%s ORDER BY line", (log_id,))
-        full_filename = os.path.join(logs_dir, filename)
-        message_file = codecs.open(full_filename, "wb", "UTF-8")
-        # Note: the original version of this code erroneously wrote to filename + ".level" instead of ".levels", producing unused level files
-        level_file = codecs.open(full_filename + '.levels', "wb", "UTF-8")
-        for message, level in message_cursor.fetchall() or []:
-            message_file.write(to_unicode(message) + "\n")
-            level_file.write(to_unicode(level) + "\n")
-        message_file.close()
-        level_file.close()
-        update_cursor.execute("UPDATE bitten_log SET filename=%s WHERE id=%s", (filename, log_id))
+    log_ids = set([row[0] for row in cursor.fetchall()])
+
+    # Read the messages of all logs in one ordered scan instead of one query
+    # per log, and write them in batches: one encode and write per batch
+    # instead of two per line, without holding a huge log in memory at once
+    cursor.execute("SELECT log, message, level FROM bitten_log_message "
+                   "ORDER BY log, line")
+    migrated = set()
+    files = None
+    while True:
+        rows = cursor.fetchmany(1000)
+        if not rows:
+            break
+        for log_id, lines in groupby(rows, itemgetter(0)):
+            if log_id not in log_ids:
+                continue
+            if log_id not in migrated:
+                if files:
+                    files[0].close()
+                    files[1].close()
+                files = open_log_files(log_id)
+                migrated.add(log_id)
+            lines = list(lines)
+            files[0].write(u"".join([to_unicode(message) + u"\n"
+                                     for _, message, level in lines]))
+            files[1].write(u"".join([to_unicode(level) + u"\n"
+                                     for _, message, level in lines]))
+    if files:
+        files[0].close()
+        files[1].close()
+
+    filenames = []
+    for log_id in sorted(log_ids):
+        if log_id not in migrated:
+            # a log without messages still gets (empty) files
+            for f in open_log_files(log_id):
+                f.close()
+        filenames.append(("%s.log" % (log_id,), log_id))
         env.log.info("Migrated log %s", log_id)
+    cursor.executemany("UPDATE bitten_log SET filename=%s WHERE id=%s",
+                       filenames)
     env.log.warning("Logs have been migrated from the database to files in %s. "
         "Ensure permissions are set correctly on this file. "
         "Since we presume that the migration worked correctly, "
@@ -485,17 +503,19 @@ def fix_log_levels_misnaming(env, db):
     delete_count = 0
     delete_error_count = 0
 
-    for wrong_filename in os.listdir(logs_dir):
+    # List the directory once and test existence against the listing
+    # rather than stat()ing each candidate
+    filenames = set(os.listdir(logs_dir))
+    for wrong_filename in sorted(filenames):
         if not wrong_filename.endswith('.log.level'):
             continue
 
         log_filename = os.path.splitext(wrong_filename)[0]
         right_filename = log_filename + '.levels'
-        full_log_filename = os.path.join(logs_dir, log_filename)
         full_wrong_filename = os.path.join(logs_dir, wrong_filename)
         full_right_filename = os.path.join(logs_dir, right_filename)
 
-        if not os.path.exists(full_log_filename):
+        if log_filename not in filenames:
             try:
                 os.remove(full_wrong_filename)
                 delete_count += 1
@@ -504,13 +524,14 @@ def fix_log_levels_misnaming(env, db):
                 delete_error_count += 1
                 env.log.warning("Error removing stray log level file %s: %s", wrong_filename, e)
         else:
-            if os.path.exists(full_right_filename):
+            if right_filename in filenames:
                 env.log.warning("Error renaming %s to %s in fix_log_levels_misnaming: new filename already exists",
                     full_wrong_filename, full_right_filename)
                 rename_error_count += 1
                 continue
             try:
                 os.rename(full_wrong_filename, full_right_filename)
+                filenames.add(right_filename)
                 rename_count += 1
                 env.log.info("Renamed incorrectly named log level file %s to %s", wrong_filename, right_filename)
             except Exception, e:
@@ -532,15 +553,15 @@ def remove_stray_log_levels_files(env, db):
     delete_count = 0
     delete_error_count = 0
 
-    for filename in os.listdir(logs_dir):
+    filenames = set(os.listdir(logs_dir))
+    for filename in filenames:
         if not filename.endswith('.log.levels'):
             continue
 
         log_filename = os.path.splitext(filename)[0]
-        full_log_filename = os.path.join(logs_dir, log_filename)
         full_filename = os.path.join(logs_dir, filename)
 
-        if not os.path.exists(full_log_filename):
+        if log_filename not in filenames:
             try:
                 os.remove(full_filename)
                 delete_count += 1
@@ -573,20 +594,28 @@ def recreate_rule_with_int_id(env, db):
 def add_config_platform_rev_index_to_build(env, db):
     """Adds a unique index on (config, platform, rev) to the bitten_build table.
        Also drops the old index on bitten_build that serves no real purpose anymore."""
-    # check for existing duplicates
-    duplicates_cursor = db.cursor()
-    build_cursor = db.cursor()
-
-    duplicates_cursor.execute("SELECT config, rev, platform FROM bitten_build GROUP BY config, rev, platform HAVING COUNT(config) > 1")
-    duplicates_exist = False
-    for config, rev, platform in duplicates_cursor.fetchall():
-        if not duplicates_exist:
-            duplicates_exist = True
-            print "\nConfig Name, Revision, Platform :: [<list of build ids>]"
-            print "--------------------------------------------------------"
-
-        build_cursor.execute("SELECT id FROM bitten_build WHERE config='%s' AND rev='%s' AND platform='%s'" % (config, rev, platform))
-        build_ids = [row[0] for row in build_cursor.fetchall()]
+    # check for existing duplicates, fetching the ids of all the builds
+    # involved in one query
+    cursor = db.cursor()
+    cursor.execute("SELECT b.config, b.rev, b.platform, b.id "
+                   "FROM bitten_build AS b "
+                   "INNER JOIN (SELECT config, rev, platform FROM bitten_build "
+                   "GROUP BY config, rev, platform HAVING COUNT(config) > 1) "
+                   "AS d ON b.config=d.config AND b.rev=d.rev "
+                   "AND b.platform=d.platform "
+                   "ORDER BY b.config, b.rev, b.platform, b.id")
+    duplicates = []
+    for config, rev, platform, id in cursor.fetchall():
+        if not duplicates or duplicates[-1][0] != (config, rev, platform):
+            duplicates.append(((config, rev, platform), []))
+        duplicates[-1][1].append(id)
+    cursor.close()
+
+    duplicates_exist = bool(duplicates)
+    if duplicates_exist:
+        print "\nConfig Name, Revision, Platform :: [<list of build ids>]"
+        print "--------------------------------------------------------"
+    for (config, rev, platform), build_ids in duplicates:
         print "%s, %s, %s :: %s" % (config, rev, platform, build_ids)
 
     if duplicates_exist:
@@ -598,9 +627,6 @@ def add_config_platform_rev_index_to_build(env, db):
         print "Upgrades cannot be performed until conflicts are resolved."
         print "The upgrade script will now exit with an error:\n"
 
-    duplicates_cursor.close()
-    build_cursor.close()
-
     if not duplicates_exist:
         cursor = db.cursor()
         scheme = parse_scheme(env)
@@ -618,10 +644,9 @@ def fix_sequences(env, db):
 
        Upgrade scripts for schema versions > 10 should handle sequence updates correctly themselves.
        """
-    update_sequence(env, db, 'bitten_build', 'id')
-    update_sequence(env, db, 'bitten_log', 'id')
-    update_sequence(env, db, 'bitten_platform', 'id')
-    update_sequence(env, db, 'bitten_report', 'id')
+    update_sequences(env, db, [('bitten_build', 'id'), ('bitten_log', 'id'),
+                               ('bitten_platform', 'id'),
+                               ('bitten_report', 'id')])
 
 
 map = {
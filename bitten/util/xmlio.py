@@ -315,8 +315,8 @@ class ParsedElement(object):
         If the parameter `name` is provided, only include elements with a
         matching local name. Otherwise, include all elements.
         """
-        for child in [c for c in self._node.childNodes if c.nodeType == 1]:
-            if name in (None, child.tagName):
+        for child in self._node.childNodes:
+            if child.nodeType == 1 and name in (None, child.tagName):
                 yield ParsedElement(child)
 
     def __iter__(self):
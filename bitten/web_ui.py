@@ -119,7 +119,8 @@ class BittenChrome(Component):
                 for config in BuildConfig.select(self.env,
                                                  include_inactive=False):
                     prev_rev = None
-                    for platform, rev, build in collect_changes(config, req.authname):
+                    for platform, rev, build in collect_changes(config,
+                                        req.authname, youngest_only=True):
                         if rev != prev_rev:
                             if prev_rev is not None:
                                break
@@ -265,7 +266,8 @@ class BuildConfigController(Component):
                 continue
 
             prev_rev = None
-            for platform, rev, build in collect_changes(config, req.authname):
+            for platform, rev, build in collect_changes(config, req.authname,
+                                                        youngest_only=True):
                 if rev != prev_rev:
                     if prev_rev is None:
                         chgset = repos.get_changeset(rev)